@@ -0,0 +1,66 @@
+"""
+SODS PoC v0.1 — Bloom filter over symbol leaf hashes
+
+Lets the verifier reject symbols that are not in a block before touching
+the proof file. Leaf hashes are already uniform SHA-256 output, so the
+k bit positions are taken directly from k 32-bit words of the hash.
+
+A positive answer is only a hint: Merkle verification stays authoritative.
+"""
+
+import math
+from typing import Iterable, List
+
+
+def bloom_size(n_items: int, false_positive_rate: float) -> int:
+    """
+    Number of bits for a filter holding n_items at the given rate.
+
+    Uses m = 1.44 * log2(1 / p) * n, rounded up to whole bytes.
+
+    Returns:
+        Filter size in bits (at least 8)
+    """
+    bits = math.ceil(1.44 * math.log2(1 / false_positive_rate) * n_items)
+    return max(8, (bits + 7) // 8 * 8)
+
+
+def _positions(leaf_hash: bytes, num_bits: int, num_hashes: int) -> List[int]:
+    """Bit positions for a leaf hash: one per 32-bit word of the hash."""
+    return [
+        int.from_bytes(leaf_hash[i * 4:i * 4 + 4], 'big') % num_bits
+        for i in range(num_hashes)
+    ]
+
+
+def build_bloom(leaf_hashes: Iterable[bytes], num_bits: int, num_hashes: int) -> bytes:
+    """
+    Build a Bloom filter bit array.
+
+    Args:
+        leaf_hashes: 32-byte leaf hashes to insert
+        num_bits: Filter size in bits (multiple of 8)
+        num_hashes: Bit positions per item (at most 8)
+
+    Returns:
+        num_bits / 8 bytes; bit j is (byte j // 8) >> (j % 8) & 1
+    """
+    bits = bytearray(num_bits // 8)
+    for leaf_hash in leaf_hashes:
+        for pos in _positions(leaf_hash, num_bits, num_hashes):
+            bits[pos >> 3] |= 1 << (pos & 7)
+    return bytes(bits)
+
+
+def bloom_contains(bits: bytes, leaf_hash: bytes, num_hashes: int) -> bool:
+    """
+    Check whether a leaf hash may be in the filter.
+
+    Returns:
+        False if the leaf hash is definitely absent, True if it may be present
+    """
+    num_bits = len(bits) * 8
+    return all(
+        bits[pos >> 3] & (1 << (pos & 7))
+        for pos in _positions(leaf_hash, num_bits, num_hashes)
+    )
@@ -1,25 +1,31 @@
 """
 SODS PoC v0.1 — Behavioral Merkle Tree Builder
 
-Fetches logs for a specific block from Sepolia via Infura,
-parses them into behavioral symbols, builds a Merkle tree,
+Fetches logs for one or more blocks from Sepolia via Infura,
+parses them into behavioral symbols, builds a Merkle tree per block,
 and saves the BMR (root) and proofs.
 
 Usage:
-    python src/bmt_builder.py
+    python src/bmt_builder.py [BLOCK ...] [--batch-size N]
 
 Outputs:
-    - bmr.bin: 32-byte Behavioral Merkle Root
-    - proofs/<symbol>_<block>.proof: Binary proof files
+    - bmr_<block>.bin: 32-byte Behavioral Merkle Root of the block
+    - proofs/bmt_<block>.dat: Indexed proofs for every symbol in the block
+    - proofs/bloom_<block>.bin: Bloom filter of the symbols present in the block
 """
 
+import argparse
 import json
 import sys
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
@@ -28,22 +34,58 @@ from config import (
     INFURA_RPC_URL,
     INFURA_PROJECT_ID,
     TARGET_BLOCK,
+    RPC_BATCH_SIZE,
     SYMBOL_REGISTRY,
-    BMR_FILE,
+    SYMBOL_REGISTRY_CI,
+    SYMBOL_LEAF_HASH,
+    PROOF_FORMAT_VERSION,
+    PROOF_FILE_MAGIC,
+    PROOF_FILE_HEADER,
+    PROOF_FILE_DIR_ENTRY,
+    BLOOM_FALSE_POSITIVE_RATE,
+    BLOOM_HASH_COUNT,
+    BLOOM_FILE_HEADER,
+    BMR_FILE_TEMPLATE,
+    PROJECT_ROOT,
     PROOFS_DIR,
+    PROOF_FILE_TEMPLATE,
+    BLOOM_FILE_TEMPLATE,
 )
-from merkle import MerkleTree, hash_symbol
+from merkle import MerkleTree
+from bloom import bloom_size, build_bloom
 
 
-def fetch_block_logs(block_number: int) -> List[Dict]:
+# Shared HTTP session: keeps the TCP/TLS connection to the RPC alive across calls.
+# Rate limits and transient server errors are retried with exponential backoff,
+# honoring Retry-After; POST is safe to retry since eth_getLogs is read-only.
+RPC_RETRY = Retry(
+    total=5,
+    backoff_factor=0.4,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(max_retries=RPC_RETRY, pool_connections=1, pool_maxsize=4))
+
+# OR-of-topics filter: only ask the node for logs whose topic[0] is in the registry
+_TOPIC_FILTER = [list(SYMBOL_REGISTRY.keys())]
+
+
+def fetch_blocks_logs(block_numbers: List[int]) -> Dict[int, List[Dict]]:
     """
-    Fetch all logs for a specific block via eth_getLogs.
+    Fetch registry logs for several blocks in a single JSON-RPC batch request.
+    
+    Logs are filtered server-side by topic[0], so only events listed in
+    SYMBOL_REGISTRY are returned. Nothing is printed, so the call can run
+    on a background thread; callers report progress themselves.
     
     Args:
-        block_number: The block number to fetch logs for
+        block_numbers: The block numbers to fetch logs for
         
     Returns:
-        List of log objects from the RPC response
+        Map of block number → list of log objects from the RPC response
         
     Raises:
         RuntimeError: If RPC call fails
@@ -56,22 +98,23 @@ def fetch_block_logs(block_number: int) -> List[Dict]:
             "Get a free key at: https://infura.io"
         )
     
-    block_hex = hex(block_number)
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "eth_getLogs",
-        "params": [{
-            "fromBlock": block_hex,
-            "toBlock": block_hex,
-        }],
-        "id": 1
-    }
-    
-    print(f"[*] Fetching logs for block #{block_number} from Sepolia...")
+    # One eth_getLogs request object per block; the id maps responses back
+    payload = [
+        {
+            "jsonrpc": "2.0",
+            "method": "eth_getLogs",
+            "params": [{
+                "fromBlock": hex(block_number),
+                "toBlock": hex(block_number),
+                "topics": _TOPIC_FILTER,
+            }],
+            "id": i
+        }
+        for i, block_number in enumerate(block_numbers)
+    ]
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             INFURA_RPC_URL,
             json=payload,
             headers={"Content-Type": "application/json"},
@@ -79,19 +122,49 @@ def fetch_block_logs(block_number: int) -> List[Dict]:
         )
         response.raise_for_status()
         
-        result = response.json()
+        results = response.json()
+        
+        # A whole-batch failure is returned as a single error object
+        if isinstance(results, dict):
+            raise RuntimeError(f"RPC Error: {results.get('error', results)}")
+        
+        logs_by_block: Dict[int, List[Dict]] = {}
+        for result in results:
+            if "error" in result:
+                raise RuntimeError(f"RPC Error: {result['error']}")
+            
+            block_number = block_numbers[result["id"]]
+            logs_by_block[block_number] = result.get("result", [])
         
-        if "error" in result:
-            raise RuntimeError(f"RPC Error: {result['error']}")
+        missing = [b for b in block_numbers if b not in logs_by_block]
+        if missing:
+            raise RuntimeError(f"RPC Error: no response for block(s) {missing}")
         
-        logs = result.get("result", [])
-        print(f"   Retrieved {len(logs)} logs")
-        return logs
+        return {b: logs_by_block[b] for b in block_numbers}
         
     except requests.RequestException as e:
         raise RuntimeError(f"Failed to fetch logs: {e}")
 
 
+def fetch_block_logs(block_number: int) -> List[Dict]:
+    """
+    Fetch registry logs for a specific block via eth_getLogs.
+    
+    Args:
+        block_number: The block number to fetch logs for
+        
+    Returns:
+        List of log objects from the RPC response
+        
+    Raises:
+        RuntimeError: If RPC call fails
+    """
+    print(f"[*] Fetching logs for block #{block_number} from Sepolia...")
+    logs = fetch_blocks_logs([block_number])[block_number]
+    print(f"   Retrieved {len(logs)} logs")
+    return logs
+
+
 def parse_logs_to_symbols(logs: List[Dict]) -> List[Tuple[str, int, Dict]]:
     """
     Parse event logs into behavioral symbols.
@@ -100,38 +173,22 @@ def parse_logs_to_symbols(logs: List[Dict]) -> List[Tuple[str, int, Dict]]:
         logs: List of log objects from eth_getLogs
         
     Returns:
-        List of (symbol, log_index, metadata) tuples, sorted deterministically
+        List of (symbol, log_index, log) tuples, sorted deterministically.
+        The raw log object is kept as-is for reference (not used in minimal mode).
     """
-    symbols = []
-    
-    for log in logs:
-        # Get the event signature (topic[0])
-        topics = log.get("topics", [])
-        if not topics:
-            continue
-        
-        topic0 = topics[0].lower()
-        
-        # Look up symbol
-        symbol = SYMBOL_REGISTRY.get(topic0)
-        if not symbol:
-            continue
-        
-        # Extract log index (hex string → int)
-        log_index = int(log.get("logIndex", "0x0"), 16)
-        
-        # Metadata for reference (not used in minimal mode)
-        metadata = {
-            "address": log.get("address", ""),
-            "topics": topics,
-            "data": log.get("data", ""),
-            "transactionHash": log.get("transactionHash", ""),
-        }
-        
-        symbols.append((symbol, log_index, metadata))
+    # Keep logs whose event signature (topic[0]) is in the registry; the
+    # topic filter already excludes unknown events, this only guards
+    # against nodes that ignore it. Topics are only lowercased on a miss.
+    # Log index is a hex string → int.
+    symbols = [
+        (symbol, int(log.get("logIndex", "0x0"), 16), log)
+        for log in logs
+        if (topics := log.get("topics"))
+        and (symbol := SYMBOL_REGISTRY_CI.get(topics[0]) or SYMBOL_REGISTRY_CI.get(topics[0].lower()))
+    ]
     
     # Sort deterministically: primary by log_index, secondary by symbol
-    symbols.sort(key=lambda x: (x[1], x[0]))
+    symbols.sort(key=itemgetter(1, 0))
     
     return symbols
 
@@ -143,7 +200,7 @@ def build_bmt(symbols: List[Tuple[str, int, Dict]]) -> Tuple[bytes, MerkleTree,
     Uses BMT-Minimal mode: leaf = SHA256(symbol.encode('utf-8'))
     
     Args:
-        symbols: List of (symbol, log_index, metadata) tuples
+        symbols: List of (symbol, log_index, log) tuples
         
     Returns:
         Tuple of (root_hash, merkle_tree, symbol_indices)
@@ -158,8 +215,8 @@ def build_bmt(symbols: List[Tuple[str, int, Dict]]) -> Tuple[bytes, MerkleTree,
     leaves = []
     symbol_indices: Dict[str, int] = {}  # Track first occurrence of each symbol
     
-    for idx, (symbol, _log_index, _metadata) in enumerate(symbols):
-        leaf_hash = hash_symbol(symbol)
+    for idx, (symbol, _log_index, _log) in enumerate(symbols):
+        leaf_hash = SYMBOL_LEAF_HASH[symbol]
         leaves.append(leaf_hash)
         
         # Store first occurrence index for each unique symbol
@@ -172,6 +229,24 @@ def build_bmt(symbols: List[Tuple[str, int, Dict]]) -> Tuple[bytes, MerkleTree,
     return tree.root, tree, symbol_indices
 
 
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """
+    Write data to path unless the file already holds exactly these bytes.
+    
+    Args:
+        path: Output file
+        data: Intended file contents
+        
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    
+    path.write_bytes(data)
+    return True
+
+
 def save_outputs(
     root: bytes,
     tree: MerkleTree,
@@ -179,7 +254,10 @@ def save_outputs(
     block_number: int
 ) -> None:
     """
-    Save BMR and proof files.
+    Save BMR, the block's indexed proof file and its Bloom filter.
+    
+    All proofs for the block go into one file (layout in config.py), with
+    a directory sorted by leaf hash so the verifier can binary-search it.
     
     Args:
         root: 32-byte Merkle root
@@ -187,31 +265,58 @@ def save_outputs(
         symbol_indices: Map of symbol → leaf index
         block_number: Block number for filenames
     """
-    # Save BMR
-    BMR_FILE.write_bytes(root)
-    print(f"[+] Saved BMR to {BMR_FILE}")
+    # Save BMR (files already up to date are left untouched)
+    bmr_file = PROJECT_ROOT / BMR_FILE_TEMPLATE.format(block=block_number)
+    if write_if_changed(bmr_file, root):
+        print(f"[+] Saved BMR to {bmr_file}")
+    else:
+        print(f"[+] BMR unchanged in {bmr_file}")
     print(f"   Root: 0x{root.hex()}")
     
-    # Save proofs for each unique symbol
-    for symbol, leaf_index in symbol_indices.items():
-        proof_bytes = tree.get_proof_bytes(leaf_index)
-        leaf_hash = tree.leaves[leaf_index]
-        
-        # Proof file format:
-        # - 32 bytes: leaf hash
-        # - 4 bytes: leaf index (big-endian)
-        # - N bytes: proof data
-        proof_data = leaf_hash + leaf_index.to_bytes(4, 'big') + proof_bytes
-        
-        # Sanitize symbol for filename (replace + with _plus)
-        safe_symbol = symbol.replace("+", "_plus").replace("-", "_minus")
-        proof_file = PROOFS_DIR / f"{safe_symbol}_{block_number}.proof"
-        proof_file.write_bytes(proof_data)
-        
-        print(f"   Proof: {proof_file.name} ({len(proof_data)} bytes)")
+    # One record per unique symbol, keyed by its leaf hash:
+    # - 4 bytes: leaf index (big-endian)
+    # - N bytes: proof data
+    records = sorted(
+        (tree.get_leaf(leaf_index), leaf_index.to_bytes(4, 'big') + tree.get_proof_bytes(leaf_index))
+        for leaf_index in symbol_indices.values()
+    )
+    
+    header_size = PROOF_FILE_HEADER.size + PROOF_FILE_DIR_ENTRY.size * len(records)
+    data = bytearray(header_size + sum(len(record) for _, record in records))
+    PROOF_FILE_HEADER.pack_into(
+        data, 0, PROOF_FILE_MAGIC, PROOF_FORMAT_VERSION, block_number, root, len(records)
+    )
+    
+    entry_offset = PROOF_FILE_HEADER.size
+    record_offset = header_size
+    for leaf_hash, record in records:
+        PROOF_FILE_DIR_ENTRY.pack_into(data, entry_offset, leaf_hash, record_offset, len(record))
+        data[record_offset:record_offset + len(record)] = record
+        entry_offset += PROOF_FILE_DIR_ENTRY.size
+        record_offset += len(record)
+    
+    proof_file = PROOFS_DIR / PROOF_FILE_TEMPLATE.format(block=block_number)
+    status = "" if write_if_changed(proof_file, data) else ", unchanged"
+    
+    print(f"   Proofs: {proof_file.name} ({len(records)} symbols, {len(data)} bytes{status})")
+    
+    # Bloom filter over the symbols' leaf hashes, for fast "not in block" answers
+    num_bits = bloom_size(len(records), BLOOM_FALSE_POSITIVE_RATE)
+    bloom = BLOOM_FILE_HEADER.pack(block_number, BLOOM_HASH_COUNT) + build_bloom(
+        (leaf_hash for leaf_hash, _ in records), num_bits, BLOOM_HASH_COUNT
+    )
+    bloom_file = PROOFS_DIR / BLOOM_FILE_TEMPLATE.format(block=block_number)
+    status = "" if write_if_changed(bloom_file, bloom) else ", unchanged"
+    
+    print(f"   Bloom: {bloom_file.name} ({num_bits} bits{status})")
 
 
-def print_summary(symbols: List[Tuple[str, int, Dict]], root: bytes, elapsed: float) -> None:
+def print_summary(
+    block_number: int,
+    symbols: List[Tuple[str, int, Dict]],
+    root: bytes,
+    elapsed: float
+) -> None:
     """Print build summary."""
     # Count symbols
     symbol_counts: Dict[str, int] = {}
@@ -221,7 +326,7 @@ def print_summary(symbols: List[Tuple[str, int, Dict]], root: bytes, elapsed: fl
     print("\n" + "="*60)
     print("BEHAVIORAL MERKLE TREE - BUILD COMPLETE")
     print("="*60)
-    print(f"   Block:        #{TARGET_BLOCK}")
+    print(f"   Block:        #{block_number}")
     print(f"   Chain:        Sepolia (testnet)")
     print(f"   Total Events: {len(symbols)}")
     print(f"   Unique Symbols:")
@@ -233,34 +338,110 @@ def print_summary(symbols: List[Tuple[str, int, Dict]], root: bytes, elapsed: fl
     print("="*60)
 
 
+def build_block(block_number: int, logs: List[Dict]) -> None:
+    """
+    Parse, build and save the BMT for one block's logs.
+    
+    The reported build time covers this block only (fetching excluded).
+    
+    Args:
+        block_number: The block number
+        logs: Logs returned by eth_getLogs for this block
+    """
+    start_time = time.perf_counter()
+    
+    # Step 2: Parse to symbols
+    print(f"\n[*] Parsing logs of block #{block_number} to behavioral symbols...")
+    symbols = parse_logs_to_symbols(logs)
+    print(f"   Found {len(symbols)} matching events")
+    
+    # Step 3: Build BMT
+    print("\n[*] Building Behavioral Merkle Tree...")
+    root, tree, symbol_indices = build_bmt(symbols)
+    
+    # Step 4: Save outputs
+    print("\n[*] Saving outputs...")
+    save_outputs(root, tree, symbol_indices, block_number)
+    
+    elapsed = time.perf_counter() - start_time
+    print_summary(block_number, symbols, root, elapsed)
+
+
+def _submit_fetch(fetcher: ThreadPoolExecutor, batch: List[int]) -> Future:
+    """Start fetching a batch of blocks on the fetcher thread."""
+    blocks_desc = ", ".join(f"#{b}" for b in batch)
+    print(f"[*] Fetching logs for block {blocks_desc} from Sepolia...")
+    return fetcher.submit(fetch_blocks_logs, batch)
+
+
+def build_blocks(block_numbers: List[int], batch_size: int = RPC_BATCH_SIZE) -> None:
+    """
+    Fetch and build BMTs for several blocks, overlapping RPC and hashing.
+    
+    Blocks are fetched in batches of one JSON-RPC call each. While one
+    batch is being parsed and hashed, the next batch is already being
+    fetched on a background thread, so the total time approaches
+    max(network, compute) instead of their sum. The first batch holds a
+    single block so that building can start after one round trip and
+    even short runs (up to batch_size blocks) overlap the rest of their
+    fetch with it.
+    
+    Args:
+        block_numbers: Blocks to build, in order
+        batch_size: Blocks per JSON-RPC batch request
+        
+    Raises:
+        RuntimeError: If an RPC call fails
+    """
+    batches = [block_numbers[:1]] + [
+        block_numbers[i:i + batch_size] for i in range(1, len(block_numbers), batch_size)
+    ]
+    
+    # All output stays on this thread; the fetcher thread only does the RPC call
+    with ThreadPoolExecutor(max_workers=1) as fetcher:
+        # Step 1: Fetch logs (one batch ahead of the build)
+        pending = _submit_fetch(fetcher, batches[0])
+        
+        for i, batch in enumerate(batches):
+            logs_by_block = pending.result()
+            for block_number in batch:
+                print(f"   Retrieved {len(logs_by_block[block_number])} logs for block #{block_number}")
+            if i + 1 < len(batches):
+                pending = _submit_fetch(fetcher, batches[i + 1])
+            
+            for block_number in batch:
+                build_block(block_number, logs_by_block[block_number])
+
+
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="SODS PoC v0.1 — Build Behavioral Merkle Trees for Sepolia blocks"
+    )
+    
+    parser.add_argument(
+        "blocks",
+        nargs="*",
+        type=int,
+        default=[TARGET_BLOCK],
+        help=f"Block numbers to build (default: {TARGET_BLOCK})"
+    )
+    
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=RPC_BATCH_SIZE,
+        help=f"Blocks per JSON-RPC batch request (default: {RPC_BATCH_SIZE})"
+    )
+    
+    args = parser.parse_args()
+    
     print("\n" + "="*60)
     print("SODS PoC v0.1 - BMT Builder")
     print("="*60 + "\n")
     
-    start_time = time.perf_counter()
-    
     try:
-        # Step 1: Fetch logs
-        logs = fetch_block_logs(TARGET_BLOCK)
-        
-        # Step 2: Parse to symbols
-        print("\n[*] Parsing logs to behavioral symbols...")
-        symbols = parse_logs_to_symbols(logs)
-        print(f"   Found {len(symbols)} matching events")
-        
-        # Step 3: Build BMT
-        print("\n[*] Building Behavioral Merkle Tree...")
-        root, tree, symbol_indices = build_bmt(symbols)
-        
-        # Step 4: Save outputs
-        print("\n[*] Saving outputs...")
-        save_outputs(root, tree, symbol_indices, TARGET_BLOCK)
-        
-        elapsed = time.perf_counter() - start_time
-        print_summary(symbols, root, elapsed)
-        
+        build_blocks(args.blocks, max(1, args.batch_size))
         return 0
         
     except Exception as e:
@@ -6,7 +6,9 @@ Chain: Ethereum Sepolia (testnet)
 Block: #5,000,000
 """
 
+import hashlib
 import os
+import struct
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -27,6 +29,9 @@ INFURA_RPC_URL = f"https://sepolia.infura.io/v3/{INFURA_PROJECT_ID}"
 TARGET_BLOCK = 10_002_322  # Block with Deposit events
 CHAIN_NAME = "sepolia"
 
+# Blocks per eth_getLogs JSON-RPC batch when building several blocks
+RPC_BATCH_SIZE = 10
+
 # =============================================================================
 # EVENT TOPIC HASHES (Keccak-256 of event signature)
 # =============================================================================
@@ -58,19 +63,56 @@ SYMBOL_REGISTRY = {
 # Reverse lookup: symbol → topic
 TOPIC_REGISTRY = {v: k for k, v in SYMBOL_REGISTRY.items()}
 
+# Precomputed BMT-Minimal leaf hashes: symbol → SHA256(symbol)
+SYMBOL_LEAF_HASH = {sym: hashlib.sha256(sym.encode('utf-8')).digest() for sym in SYMBOL_REGISTRY.values()}
+
+# Case-insensitive lookup: lowercase topic → symbol
+# RPC nodes return lowercase hex, so most lookups hit without calling .lower()
+SYMBOL_REGISTRY_CI = {k.lower(): v for k, v in SYMBOL_REGISTRY.items()}
+
 # =============================================================================
 # UNISWAP V2 CONFIGURATION (Sepolia)
 # =============================================================================
 
 UNISWAP_V2_FACTORY = "0xF62c03E08ada871A0bEb309762E260a7a6a880E6"
 
+# =============================================================================
+# PROOF FORMAT
+#   1: one file per symbol, per-element direction byte (unversioned)
+#   2: one file per symbol, packed direction bitmap
+#   3: one indexed file per block
+# =============================================================================
+
+PROOF_FORMAT_VERSION = 3
+
+# Indexed proof file layout (integers big-endian):
+#   header:    MAGIC(4) | VERSION(2) | BLOCK(8) | ROOT(32) | N_SYMBOLS(4)
+#   directory: N_SYMBOLS x (LEAF_HASH(32) | OFFSET(4) | LENGTH(4)), sorted by leaf hash
+#   payload:   per symbol, LEAF_INDEX(4) | proof data
+PROOF_FILE_MAGIC = b"SBMT"
+PROOF_FILE_HEADER = struct.Struct(">4sHQ32sI")
+PROOF_FILE_DIR_ENTRY = struct.Struct(">32sII")
+
+# =============================================================================
+# BLOOM FILTER
+# Symbol leaf hashes present in the block, for cheap negative lookups
+# =============================================================================
+
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+BLOOM_HASH_COUNT = 4  # bit positions per symbol, from 32-bit words of its leaf hash
+
+# Bloom file layout: BLOCK(8, big-endian) | HASH_COUNT(1) | bit array
+BLOOM_FILE_HEADER = struct.Struct(">QB")
+
 # =============================================================================
 # OUTPUT PATHS
 # =============================================================================
 
 PROJECT_ROOT = Path(__file__).parent  # poc/ directory
-BMR_FILE = PROJECT_ROOT / "bmr.bin"
+BMR_FILE_TEMPLATE = "bmr_{block}.bin"  # inside PROJECT_ROOT
 PROOFS_DIR = PROJECT_ROOT / "proofs"
+PROOF_FILE_TEMPLATE = "bmt_{block}.dat"  # inside PROOFS_DIR
+BLOOM_FILE_TEMPLATE = "bloom_{block}.bin"  # inside PROOFS_DIR
 
 # Ensure proofs directory exists
 PROOFS_DIR.mkdir(exist_ok=True)
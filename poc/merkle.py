@@ -5,8 +5,191 @@ A minimal, deterministic Merkle tree using SHA-256.
 Follows the BMT construction algorithm from SODS RFC v0.2 Section 4.
 """
 
+import ctypes
 import hashlib
-from typing import List, Optional, Tuple
+import os
+from array import array
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, List, Optional, Tuple
+
+# OpenSSL SHA-256 constructor bound once, skipping hashlib's dispatch per call
+try:
+    from _hashlib import openssl_sha256 as _sha256
+except ImportError:  # Python built without OpenSSL
+    _sha256 = hashlib.sha256
+
+
+# =============================================================================
+# BATCHED PAIR HASHING
+# Backends, in order of preference:
+#   1. libhashtree (SHA-NI / AVX multi-buffer) via ctypes
+#   2. Numba-compiled SHA-256 (merkle_numba), only with SODS_NUMBA=1:
+#      it is slower than hashlib on CPUs with SHA extensions
+#   3. hashlib, one call per pair
+# Without a batched backend (1 or 2), MerkleTree hashes pair by pair
+# straight from its leaf list and never builds batch buffers.
+# =============================================================================
+
+@lru_cache(maxsize=None)
+def _load_hashtree() -> Optional[ctypes.CDLL]:
+    """
+    Load libhashtree on first use, if available and usable on this CPU.
+    
+    The library path can be set with SODS_HASHTREE_LIB; otherwise the
+    system library search path is used. hashtree_init() performs the
+    CPUID dispatch (SHA-NI, AVX-512, AVX2, ...) and returns 0 when no
+    accelerated implementation is available. The library search takes
+    milliseconds, so verify-only tools never pay for it.
+    
+    Returns:
+        Loaded library, or None to fall back to hashlib
+    """
+    import ctypes.util
+    
+    path = os.getenv("SODS_HASHTREE_LIB") or ctypes.util.find_library("hashtree")
+    if not path:
+        return None
+    
+    try:
+        lib = ctypes.CDLL(path)
+        lib.hashtree_init.argtypes = [ctypes.c_void_p]
+        lib.hashtree_init.restype = ctypes.c_int
+        lib.hashtree_hash.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint64]
+        lib.hashtree_hash.restype = None
+        if not lib.hashtree_init(None):
+            return None
+    except (OSError, AttributeError):
+        return None
+    
+    return lib
+
+
+@lru_cache(maxsize=None)
+def _load_numba() -> Optional[Callable[[memoryview, memoryview, int], None]]:
+    """
+    Import the Numba backend on first use, if enabled with SODS_NUMBA=1.
+    
+    OpenSSL's hashlib uses SHA extensions where the CPU has them and beats
+    the Numba hasher there, so Numba is opt-in rather than picked just
+    because it is installed. Importing merkle_numba loads numba and
+    compiles part of SHA-256, so it is deferred until a tree is actually
+    built; verify-only tools never pay for it.
+    
+    Returns:
+        merkle_numba.build_layer, or None if not enabled or not installed
+    """
+    if os.getenv("SODS_NUMBA") != "1":
+        return None
+    
+    try:
+        from merkle_numba import build_layer
+    except ImportError:
+        return None
+    
+    return build_layer
+
+
+def _c_buffer(buf: memoryview, size: int) -> ctypes.Array:
+    """Wrap a buffer for ctypes without copying (copies only read-only input)."""
+    view = memoryview(buf)
+    if view.readonly:
+        return (ctypes.c_char * size).from_buffer_copy(view)
+    return (ctypes.c_char * size).from_buffer(view)
+
+
+def hash_pairs(out: memoryview, data: memoryview, count: int) -> None:
+    """
+    Hash `count` consecutive 64-byte blocks with SHA-256, in place.
+    
+    Args:
+        out: Writable buffer receiving count * 32 bytes of parent hashes
+        data: count * 64 bytes of concatenated (left || right) pairs
+        count: Number of pairs
+    """
+    hashtree = _load_hashtree()
+    if hashtree is not None:
+        hashtree.hashtree_hash(_c_buffer(out, count * 32), _c_buffer(data, count * 64), count)
+        return
+    
+    numba_build_layer = _load_numba()
+    if numba_build_layer is not None:
+        numba_build_layer(out, data, count)
+        return
+    
+    sha256 = _sha256
+    for i in range(count):
+        out[i * 32:i * 32 + 32] = sha256(data[i * 64:i * 64 + 64]).digest()
+
+
+def _has_batched_backend() -> bool:
+    """Whether hash_pairs() has a batched backend (libhashtree or Numba)."""
+    return _load_hashtree() is not None or _load_numba() is not None
+
+
+# =============================================================================
+# SPECIALIZED BUILDERS
+# Tree shape depends only on the leaf count, so each count gets a generated
+# straight-line builder with all offsets and odd-node duplications resolved
+# =============================================================================
+
+# Shapes and builders kept for the most recently used leaf counts
+_SPECIALIZED_BUILDER_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=_SPECIALIZED_BUILDER_CACHE_SIZE)
+def _tree_shape(leaf_count: int) -> Tuple[Tuple[int, ...], array]:
+    """
+    Nodes per level from the leaves up to the root (empty for no leaves),
+    and the starting node offset of each level. Shared between trees of
+    the same leaf count, so the offsets array must not be modified.
+    """
+    sizes = [leaf_count] if leaf_count else []
+    while sizes and sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return tuple(sizes), array('I', accumulate(sizes, initial=0))
+
+
+@lru_cache(maxsize=_SPECIALIZED_BUILDER_CACHE_SIZE)
+def _specialized_builder(leaf_count: int) -> Callable[[memoryview], None]:
+    """
+    Get the builder for a tree of `leaf_count` leaves, generating it on first use.
+    
+    The builder fills every level above the leaves in a flat level-order
+    buffer (see MerkleTree): one hash_pairs() call per level with constant
+    slice bounds, plus one duplicated-node hash for each odd-length level.
+    
+    Args:
+        leaf_count: Number of leaves (cache key)
+        
+    Returns:
+        Function taking a writable memoryview of the flat buffer
+    """
+    sizes, offsets = _tree_shape(leaf_count)
+    
+    lines = ["def build(mv):"]
+    for level, n in enumerate(sizes[:-1]):
+        cur = offsets[level] * 32
+        nxt = offsets[level + 1] * 32
+        n_pairs = n // 2
+        
+        # Parent = H(left || right), read directly from the contiguous level
+        lines.append(
+            f"    hash_pairs(mv[{nxt}:{nxt + n_pairs * 32}], mv[{cur}:{cur + n_pairs * 64}], {n_pairs})"
+        )
+        
+        # If odd number of nodes, duplicate the last one
+        if n % 2:
+            parent = nxt + n_pairs * 32
+            last = cur + (n - 1) * 32
+            lines.append(f"    mv[{parent}:{parent + 32}] = sha256(bytes(mv[{last}:{last + 32}]) * 2).digest()")
+    
+    if len(lines) == 1:
+        lines.append("    pass")
+    
+    namespace = {"hash_pairs": hash_pairs, "sha256": _sha256}
+    exec(compile("\n".join(lines), f"<merkle_{leaf_count}>", "exec"), namespace)
+    return namespace["build"]
 
 
 class MerkleTree:
@@ -23,49 +206,129 @@ class MerkleTree:
         """
         Build a Merkle tree from a list of leaf hashes.
         
+        All levels are stored level-order in one flat bytearray: level l
+        starts at node offsets[l] and holds sizes[l] nodes, and node i of
+        level l lives at (offsets[l] + i) * 32. The leaves are level 0, so
+        they are not stored twice. Without a batched hasher the buffer is
+        joined from the hashed layers on first use (see _build_per_pair).
+        The leaves and layers properties return copies as lists of bytes
+        for compatibility.
+        
         Args:
-            leaves: List of 32-byte SHA-256 hashes (pre-hashed leaves)
+            leaves: List of 32-byte SHA-256 hashes (pre-hashed leaves),
+                copied into the tree's own buffer
+                
+        Raises:
+            ValueError: If a leaf is not 32 bytes long
         """
-        self.leaves = leaves
-        self.layers: List[List[bytes]] = []
+        if leaves and set(map(len, leaves)) != {32}:
+            bad = next(i for i, leaf in enumerate(leaves) if len(leaf) != 32)
+            raise ValueError(f"Leaf {bad} is {len(leaves[bad])} bytes, expected 32")
+        
+        self.leaf_count = len(leaves)
+        
+        # Level sizes from leaves up to the root, and their node offsets
+        self.sizes, self.offsets = _tree_shape(self.leaf_count)
+        
+        # The flat buffer, or the layers it is joined from on first use;
+        # leaves are always copied, so the caller's data is never touched
+        self._flat: Optional[bytearray] = None
+        self._layers: Optional[List[List[bytes]]] = None
         self.root: bytes = b''
         
-        if leaves:
-            self._build()
+        if self.leaf_count:
+            self._build(leaves)
         else:
             # Empty tree: root = SHA256('')
-            self.root = hashlib.sha256(b'').digest()
+            self._flat = bytearray()
+            self.root = _sha256(b'').digest()
+    
+    @property
+    def flat(self) -> bytearray:
+        """All levels, level-order, in one buffer (see __init__)."""
+        if self._flat is None:
+            self._flat = bytearray(b''.join([b''.join(layer) for layer in self._layers]))
+            self._layers = None
+        return self._flat
     
-    def _build(self) -> None:
+    def _build(self, leaves: List[bytes]) -> None:
         """Build the Merkle tree from leaves to root."""
-        # Layer 0 = leaves
-        current_layer = self.leaves.copy()
-        self.layers.append(current_layer)
+        if not _has_batched_backend():
+            self._build_per_pair(leaves)
+            return
         
-        # Build up to root
-        while len(current_layer) > 1:
-            next_layer = []
+        self._flat = bytearray(b''.join(leaves))
+        self._flat.extend(bytes((self.offsets[-1] - self.leaf_count) * 32))
+        mv = memoryview(self._flat)
+        
+        # Build up to root, hashing each level's pairs in one batch
+        _specialized_builder(self.leaf_count)(mv)
+        
+        # Root is the single node in the top level, at the end of the buffer
+        self.root = bytes(mv[-32:])
+    
+    def _build_per_pair(self, leaves: List[bytes]) -> None:
+        """
+        Build the tree with one hashlib call per parent node.
+        
+        Used when hash_pairs() has no batched backend: hashing memoryview
+        slices of a flat buffer then costs more than concatenating the two
+        child hashes, so layers are kept as lists of bytes, as hashed, and
+        only joined into the flat buffer when a node is first read.
+        """
+        sha256 = _sha256
+        layer = list(leaves)  # copied: the caller keeps its list
+        layers = [layer]
+        
+        while len(layer) > 1:
+            # If odd number of nodes, duplicate the last one
+            if len(layer) % 2:
+                layer = layer + [layer[-1]]
             
-            for i in range(0, len(current_layer), 2):
-                left = current_layer[i]
-                
-                # If odd number of nodes, duplicate the last one
-                if i + 1 < len(current_layer):
-                    right = current_layer[i + 1]
-                else:
-                    right = left
-                
-                # Parent = H(left || right)
-                parent = hashlib.sha256(left + right).digest()
-                next_layer.append(parent)
+            # Parent = H(left || right)
+            parents = []
+            for i in range(0, len(layer), 2):
+                parents.append(sha256(layer[i] + layer[i + 1]).digest())
             
-            self.layers.append(next_layer)
-            current_layer = next_layer
+            layers.append(parents)
+            layer = parents
+        
+        self._layers = layers
         
         # Root is the single node in the top layer
-        self.root = self.layers[-1][0] if self.layers else hashlib.sha256(b'').digest()
+        self.root = bytes(layer[0])
+    
+    def get_node(self, level: int, index: int) -> bytes:
+        """Return the 32-byte hash of a node at (level, index)."""
+        start = (self.offsets[level] + index) * 32
+        return bytes(self.flat[start:start + 32])
+    
+    def get_leaf(self, index: int) -> bytes:
+        """Return the 32-byte leaf hash at index."""
+        return self.get_node(0, index)
+    
+    @property
+    def leaves(self) -> List[bytes]:
+        """
+        Leaf hashes as a list of 32-byte bytes (copied from the flat buffer).
+        
+        Prefer get_leaf() for single lookups.
+        """
+        return [self.get_node(0, i) for i in range(self.leaf_count)]
     
-    def get_proof(self, leaf_index: int) -> List[Tuple[bytes, str]]:
+    @property
+    def layers(self) -> List[List[bytes]]:
+        """
+        All levels, leaves first, as lists of 32-byte bytes (copied).
+        
+        Prefer get_node() for single lookups.
+        """
+        return [
+            [self.get_node(level, i) for i in range(size)]
+            for level, size in enumerate(self.sizes)
+        ]
+    
+    def get_proof(self, leaf_index: int) -> List[Tuple[bytes, int]]:
         """
         Generate Merkle proof for a leaf at given index.
         
@@ -73,49 +336,46 @@ class MerkleTree:
             leaf_index: 0-based index of the leaf
             
         Returns:
-            List of (sibling_hash, direction) tuples where direction is 'L' or 'R'
-            indicating whether the sibling is on the left or right.
+            List of (sibling_hash, direction) tuples where direction is 0 or 1
+            indicating whether the sibling is on the left (0) or right (1).
             
         Raises:
             IndexError: If leaf_index is out of bounds
         """
-        if not self.leaves:
+        if not self.leaf_count:
             return []
         
-        if leaf_index < 0 or leaf_index >= len(self.leaves):
-            raise IndexError(f"Leaf index {leaf_index} out of bounds (0-{len(self.leaves)-1})")
+        if leaf_index < 0 or leaf_index >= self.leaf_count:
+            raise IndexError(f"Leaf index {leaf_index} out of bounds (0-{self.leaf_count-1})")
         
+        flat = self.flat
+        offsets = self.offsets
         proof = []
         idx = leaf_index
         
-        # Traverse from leaf layer (0) up to second-to-last layer
-        for layer in self.layers[:-1]:
-            # Get sibling index
-            if idx % 2 == 0:
-                # Current is left child, sibling is right
-                sibling_idx = idx + 1
-                direction = 'R'
-            else:
-                # Current is right child, sibling is left
-                sibling_idx = idx - 1
-                direction = 'L'
+        # Traverse from leaf level (0) up to second-to-last level
+        for level, size in enumerate(self.sizes[:-1]):
+            # Sibling differs in the lowest bit; a right child (bit 1) has
+            # its sibling on the left (direction 0) and vice versa
+            sibling_idx = idx ^ 1
+            direction = (idx & 1) ^ 1
             
-            # Handle odd-length layers (last node has no sibling, so duplicate)
-            if sibling_idx >= len(layer):
+            # Handle odd-length levels (last node has no sibling, so duplicate)
+            if sibling_idx >= size:
                 sibling_idx = idx  # Use self as sibling (duplication case)
             
-            sibling_hash = layer[sibling_idx]
-            proof.append((sibling_hash, direction))
+            start = (offsets[level] + sibling_idx) * 32
+            proof.append((bytes(flat[start:start + 32]), direction))
             
             # Move to parent index
-            idx = idx // 2
+            idx >>= 1
         
         return proof
     
     @staticmethod
     def verify_proof(
         leaf_hash: bytes,
-        proof: List[Tuple[bytes, str]],
+        proof: List[Tuple[bytes, int]],
         expected_root: bytes
     ) -> bool:
         """
@@ -123,21 +383,70 @@ class MerkleTree:
         
         Args:
             leaf_hash: The hash of the leaf being verified
-            proof: List of (sibling_hash, direction) tuples
+            proof: List of (sibling_hash, direction) tuples (0=L, 1=R)
             expected_root: The expected Merkle root
             
         Returns:
             True if proof is valid, False otherwise
         """
+        sha256 = _sha256
         current = leaf_hash
         
         for sibling_hash, direction in proof:
-            if direction == 'L':
+            if direction == 0:
                 # Sibling is on the left
-                current = hashlib.sha256(sibling_hash + current).digest()
+                current = sha256(sibling_hash + current).digest()
             else:
                 # Sibling is on the right
-                current = hashlib.sha256(current + sibling_hash).digest()
+                current = sha256(current + sibling_hash).digest()
+        
+        return current == expected_root
+    
+    @staticmethod
+    def verify_proof_bytes(leaf_hash: bytes, proof_bytes: bytes, expected_root: bytes) -> bool:
+        """
+        Verify a binary proof (see get_proof_bytes) without parsing it first.
+        
+        Walks the sibling hashes in place over a memoryview and hashes as it
+        goes, so no intermediate list of tuples is built.
+        
+        Args:
+            leaf_hash: The hash of the leaf being verified
+            proof_bytes: Binary proof data
+            expected_root: The expected Merkle root
+            
+        Returns:
+            True if proof is valid, False otherwise
+            
+        Raises:
+            ValueError: If proof_bytes is shorter than its header declares
+        """
+        if not proof_bytes:
+            return leaf_hash == expected_root
+        
+        mv = memoryview(proof_bytes)
+        num_elements = mv[0]
+        bitmap_len = (num_elements + 7) // 8
+        if len(mv) < 1 + bitmap_len + 32 * num_elements:
+            raise ValueError(f"Invalid proof: too short ({len(mv)} bytes)")
+        
+        dir_bits = int.from_bytes(mv[1:1 + bitmap_len], 'little')
+        sha256 = _sha256
+        current = leaf_hash
+        offset = 1 + bitmap_len
+        
+        for i in range(num_elements):
+            sibling_hash = mv[offset:offset + 32]
+            if (dir_bits >> i) & 1:
+                # Sibling is on the right
+                h = sha256(current)
+                h.update(sibling_hash)
+            else:
+                # Sibling is on the left
+                h = sha256(sibling_hash)
+                h.update(current)
+            current = h.digest()
+            offset += 32
         
         return current == expected_root
     
@@ -146,51 +455,76 @@ class MerkleTree:
         Get proof as a compact binary format.
         
         Format:
-            - 1 byte: number of proof elements
-            - For each element: 1 byte direction (0=L, 1=R) + 32 bytes hash
+            - 1 byte: number of proof elements (n)
+            - ceil(n / 8) bytes: direction bitmap, little-endian;
+              bit i = 0 if sibling i is on the left, 1 if on the right
+            - n * 32 bytes: sibling hashes, leaf to root
             
         Returns:
             Binary proof data
         """
-        proof = self.get_proof(leaf_index)
+        if not self.leaf_count:
+            return b'\x00'
         
-        result = bytes([len(proof)])
-        for sibling_hash, direction in proof:
-            dir_byte = 0 if direction == 'L' else 1
-            result += bytes([dir_byte]) + sibling_hash
+        if leaf_index < 0 or leaf_index >= self.leaf_count:
+            raise IndexError(f"Leaf index {leaf_index} out of bounds (0-{self.leaf_count-1})")
+        
+        flat = self.flat
+        offsets = self.offsets
+        sizes = self.sizes
+        n = len(sizes) - 1
+        bitmap_len = (n + 7) // 8
         
-        return result
+        # Slice siblings straight from the flat buffer (same walk as
+        # get_proof(), without building tuples) and join them once
+        siblings = []
+        dir_bits = 0
+        idx = leaf_index
+        for level in range(n):
+            sibling_idx = idx ^ 1
+            dir_bits |= ((idx & 1) ^ 1) << level
+            if sibling_idx >= sizes[level]:
+                sibling_idx = idx
+            start = (offsets[level] + sibling_idx) * 32
+            siblings.append(flat[start:start + 32])
+            idx >>= 1
+        
+        return bytes([n]) + dir_bits.to_bytes(bitmap_len, 'little') + b''.join(siblings)
     
     @staticmethod
-    def parse_proof_bytes(proof_bytes: bytes) -> List[Tuple[bytes, str]]:
+    def parse_proof_bytes(proof_bytes: bytes) -> List[Tuple[bytes, int]]:
         """
         Parse binary proof format back to list of tuples.
         
         Args:
-            proof_bytes: Binary proof data
+            proof_bytes: Binary proof data (see get_proof_bytes)
             
         Returns:
-            List of (sibling_hash, direction) tuples
+            List of (sibling_hash, direction) tuples (0=L, 1=R)
+            
+        Raises:
+            ValueError: If proof_bytes is shorter than its header declares
         """
         if not proof_bytes:
             return []
         
         num_elements = proof_bytes[0]
-        proof = []
-        offset = 1
+        bitmap_len = (num_elements + 7) // 8
+        if len(proof_bytes) < 1 + bitmap_len + 32 * num_elements:
+            raise ValueError(f"Invalid proof: too short ({len(proof_bytes)} bytes)")
         
-        for _ in range(num_elements):
-            direction = 'L' if proof_bytes[offset] == 0 else 'R'
-            sibling_hash = proof_bytes[offset + 1:offset + 33]
-            proof.append((sibling_hash, direction))
-            offset += 33
+        dir_bits = int.from_bytes(proof_bytes[1:1 + bitmap_len], 'little')
+        offset = 1 + bitmap_len
         
-        return proof
+        return [
+            (proof_bytes[offset + 32 * i:offset + 32 * i + 32], (dir_bits >> i) & 1)
+            for i in range(num_elements)
+        ]
 
 
 def hash_leaf(data: bytes) -> bytes:
     """Hash leaf data with SHA-256."""
-    return hashlib.sha256(data).digest()
+    return _sha256(data).digest()
 
 
 def hash_symbol(symbol: str) -> bytes:
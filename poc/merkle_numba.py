@@ -0,0 +1,150 @@
+"""
+SODS PoC v0.1 — Numba-compiled Merkle layer hashing
+
+Opt-in (SODS_NUMBA=1) JIT backend for MerkleTree._build without libhashtree.
+SHA-256 is implemented directly in Numba (hashlib cannot be called from
+nopython code), specialized for 64-byte (left || right) inputs: the
+second compression block is always the same padding block, so its
+message schedule is computed once at import.
+
+Requires numba and numpy; importing this module raises ImportError if
+they are not installed.
+"""
+
+import numpy as np
+from numba import njit
+
+
+# SHA-256 round constants
+_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+# SHA-256 initial hash value
+_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+_MASK = 0xFFFFFFFF
+
+
+@njit(cache=True)
+def _rotr(x, n):
+    return ((x >> n) | (x << (32 - n))) & _MASK
+
+
+@njit(cache=True)
+def _expand(w):
+    """Extend w[0:16] to the full 64-word message schedule in place."""
+    for t in range(16, 64):
+        s0 = _rotr(w[t - 15], 7) ^ _rotr(w[t - 15], 18) ^ (w[t - 15] >> 3)
+        s1 = _rotr(w[t - 2], 17) ^ _rotr(w[t - 2], 19) ^ (w[t - 2] >> 10)
+        w[t] = (w[t - 16] + s0 + w[t - 7] + s1) & _MASK
+
+
+@njit(cache=True)
+def _compress(state, w, k):
+    """Run the 64 SHA-256 rounds over schedule w and add into state."""
+    a = state[0]
+    b = state[1]
+    c = state[2]
+    d = state[3]
+    e = state[4]
+    f = state[5]
+    g = state[6]
+    h = state[7]
+
+    for t in range(64):
+        s1 = _rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)
+        ch = (e & f) ^ (~e & g)
+        t1 = (h + s1 + ch + k[t] + w[t]) & _MASK
+        s0 = _rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)
+        maj = (a & b) ^ (a & c) ^ (b & c)
+        t2 = (s0 + maj) & _MASK
+        h = g
+        g = f
+        f = e
+        e = (d + t1) & _MASK
+        d = c
+        c = b
+        b = a
+        a = (t1 + t2) & _MASK
+
+    state[0] = (state[0] + a) & _MASK
+    state[1] = (state[1] + b) & _MASK
+    state[2] = (state[2] + c) & _MASK
+    state[3] = (state[3] + d) & _MASK
+    state[4] = (state[4] + e) & _MASK
+    state[5] = (state[5] + f) & _MASK
+    state[6] = (state[6] + g) & _MASK
+    state[7] = (state[7] + h) & _MASK
+
+
+def _padding_schedule() -> np.ndarray:
+    """Message schedule of the padding block for a 64-byte message."""
+    w = np.zeros(64, dtype=np.int64)
+    w[0] = 0x80000000  # 0x80 terminator byte
+    w[15] = 512        # message length in bits
+    _expand(w)
+    return w
+
+
+_PAD_W = _padding_schedule()
+
+
+@njit(cache=True)
+def _build_layer(cur, nxt, n_pairs, k, h0, pad_w):
+    w = np.empty(64, dtype=np.int64)
+    state = np.empty(8, dtype=np.int64)
+
+    for p in range(n_pairs):
+        src = p * 64
+
+        # Load the 64-byte pair as 16 big-endian words
+        for t in range(16):
+            i = src + t * 4
+            w[t] = (
+                (np.int64(cur[i]) << 24) | (np.int64(cur[i + 1]) << 16)
+                | (np.int64(cur[i + 2]) << 8) | np.int64(cur[i + 3])
+            )
+        _expand(w)
+
+        for j in range(8):
+            state[j] = h0[j]
+        _compress(state, w, k)
+        _compress(state, pad_w, k)
+
+        # Store the digest big-endian
+        dst = p * 32
+        for j in range(8):
+            x = state[j]
+            nxt[dst + j * 4] = (x >> 24) & 0xFF
+            nxt[dst + j * 4 + 1] = (x >> 16) & 0xFF
+            nxt[dst + j * 4 + 2] = (x >> 8) & 0xFF
+            nxt[dst + j * 4 + 3] = x & 0xFF
+
+
+def build_layer(out: memoryview, data: memoryview, n_pairs: int) -> None:
+    """
+    Hash `n_pairs` consecutive 64-byte blocks with SHA-256, in place.
+
+    Args:
+        out: Writable buffer receiving n_pairs * 32 bytes of parent hashes
+        data: n_pairs * 64 bytes of concatenated (left || right) pairs
+        n_pairs: Number of pairs
+    """
+    _build_layer(
+        np.frombuffer(data, dtype=np.uint8),
+        np.frombuffer(out, dtype=np.uint8),
+        n_pairs,
+        _K,
+        _H0,
+        _PAD_W,
+    )
@@ -5,16 +5,17 @@ CLI tool to verify that a behavioral symbol exists in a block
 by validating its Merkle proof against the stored BMR.
 
 Usage:
-    python src/verifier.py --symbol LP+ --block 5000000 --local
+    python verifier.py --symbol Dep --block 10002322 --local
 
 Output:
-    [+] Verified: LP+ exists in block 5000000
-    Proof size: 287 bytes
+    [+] Verified: Dep exists in block 10002322
+    Proof size: 198 bytes
     Verification time: < 20 ms
     Cost: $0.00
 """
 
 import argparse
+import mmap
 import sys
 import time
 from pathlib import Path
@@ -22,72 +23,165 @@ from pathlib import Path
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import BMR_FILE, PROOFS_DIR, TARGET_BLOCK
+from config import (
+    BMR_FILE_TEMPLATE,
+    PROJECT_ROOT,
+    PROOFS_DIR,
+    PROOF_FILE_TEMPLATE,
+    PROOF_FORMAT_VERSION,
+    PROOF_FILE_MAGIC,
+    PROOF_FILE_HEADER,
+    PROOF_FILE_DIR_ENTRY,
+    SYMBOL_LEAF_HASH,
+    BLOOM_FILE_TEMPLATE,
+    BLOOM_FILE_HEADER,
+    TARGET_BLOCK,
+)
 from merkle import MerkleTree, hash_symbol
+from bloom import bloom_contains
 
 
-def load_bmr() -> bytes:
+def load_bmr(block_number: int) -> bytes:
     """
-    Load the Behavioral Merkle Root from file.
+    Load the Behavioral Merkle Root of a block from file.
     
+    Args:
+        block_number: The block number
+        
     Returns:
         32-byte root hash
         
     Raises:
-        FileNotFoundError: If bmr.bin doesn't exist
+        FileNotFoundError: If the block's BMR file doesn't exist
     """
-    if not BMR_FILE.exists():
+    bmr_file = PROJECT_ROOT / BMR_FILE_TEMPLATE.format(block=block_number)
+    if not bmr_file.exists():
         raise FileNotFoundError(
-            f"BMR file not found: {BMR_FILE}\n"
+            f"BMR file not found: {bmr_file}\n"
             "Run bmt_builder.py first to generate the BMR."
         )
     
-    root = BMR_FILE.read_bytes()
+    root = bmr_file.read_bytes()
     if len(root) != 32:
         raise ValueError(f"Invalid BMR: expected 32 bytes, got {len(root)}")
     
     return root
 
 
-def load_proof(symbol: str, block_number: int) -> tuple:
+def bloom_may_contain(leaf_hash: bytes, block_number: int) -> bool:
     """
-    Load proof file for a symbol.
+    Check the block's Bloom filter for a symbol's leaf hash.
+    
+    Args:
+        leaf_hash: The symbol's leaf hash
+        block_number: The block number
+        
+    Returns:
+        False if the symbol is definitely not in the block; True if it may
+        be, or if no Bloom filter is available for this block
+    """
+    bloom_file = PROOFS_DIR / BLOOM_FILE_TEMPLATE.format(block=block_number)
+    if not bloom_file.exists():
+        return True
+    
+    data = bloom_file.read_bytes()
+    if len(data) <= BLOOM_FILE_HEADER.size:
+        return True
+    
+    file_block, num_hashes = BLOOM_FILE_HEADER.unpack_from(data, 0)
+    if file_block != block_number:
+        return True
+    
+    return bloom_contains(data[BLOOM_FILE_HEADER.size:], leaf_hash, num_hashes)
+
+
+def load_proof(symbol: str, block_number: int, bmr: bytes) -> tuple:
+    """
+    Load the proof for a symbol from the block's indexed proof file.
+    
+    The block's Bloom filter is checked first. The proof file is then
+    memory-mapped and its directory (sorted by leaf hash) is
+    binary-searched, so only the pages holding the entry are read.
     
     Args:
         symbol: The behavioral symbol (e.g., "LP+")
         block_number: The block number
+        bmr: The block's BMR; must match the root recorded in the proof file
         
     Returns:
-        Tuple of (leaf_hash, leaf_index, proof_bytes)
+        Tuple of (leaf_hash, leaf_index, proof_bytes, proof_size)
         
     Raises:
-        FileNotFoundError: If proof file doesn't exist
+        FileNotFoundError: If the proof file or the symbol's entry doesn't exist
+        ValueError: If the proof file is invalid or was built for another BMR
     """
-    # Sanitize symbol for filename
-    safe_symbol = symbol.replace("+", "_plus").replace("-", "_minus")
-    proof_file = PROOFS_DIR / f"{safe_symbol}_{block_number}.proof"
+    proof_file = PROOFS_DIR / PROOF_FILE_TEMPLATE.format(block=block_number)
+    leaf_hash = SYMBOL_LEAF_HASH.get(symbol) or hash_symbol(symbol)
+    
+    # Definite misses are answered by the Bloom filter without opening the proof file
+    if not bloom_may_contain(leaf_hash, block_number):
+        raise FileNotFoundError(
+            f"Symbol '{symbol}' does not exist in block #{block_number} (Bloom filter)."
+        )
     
     if not proof_file.exists():
         raise FileNotFoundError(
             f"Proof file not found: {proof_file}\n"
-            f"Symbol '{symbol}' may not exist in block #{block_number}."
+            "Run bmt_builder.py first to generate the proofs."
         )
     
-    proof_data = proof_file.read_bytes()
+    with open(proof_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if len(mm) < PROOF_FILE_HEADER.size:
+            raise ValueError(f"Invalid proof file: too short ({len(mm)} bytes)")
+        
+        magic, version, file_block, file_root, count = PROOF_FILE_HEADER.unpack_from(mm, 0)
+        if magic != PROOF_FILE_MAGIC:
+            raise ValueError(f"Invalid proof file: bad magic {magic!r}")
+        if version != PROOF_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported proof format version {version} "
+                f"(expected {PROOF_FORMAT_VERSION})\n"
+                "Run bmt_builder.py again to regenerate the proofs."
+            )
+        if file_block != block_number:
+            raise ValueError(f"Proof file is for block #{file_block}, not #{block_number}")
+        if file_root != bmr:
+            raise ValueError(
+                f"BMR belongs to another block: proof file root 0x{file_root.hex()} "
+                f"does not match BMR 0x{bmr.hex()} for block #{block_number}\n"
+                "Run bmt_builder.py again for this block."
+            )
+        
+        # Binary search the directory for the symbol's leaf hash
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = PROOF_FILE_HEADER.size + mid * PROOF_FILE_DIR_ENTRY.size
+            if mm[entry:entry + 32] < leaf_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        entry = PROOF_FILE_HEADER.size + lo * PROOF_FILE_DIR_ENTRY.size
+        if lo == count or mm[entry:entry + 32] != leaf_hash:
+            raise FileNotFoundError(
+                f"No proof for symbol '{symbol}' in {proof_file}\n"
+                f"Symbol '{symbol}' may not exist in block #{block_number}."
+            )
+        
+        _, offset, length = PROOF_FILE_DIR_ENTRY.unpack_from(mm, entry)
+        record = mm[offset:offset + length]
     
-    # Parse proof file format:
-    # - 32 bytes: leaf hash
+    # Record format:
     # - 4 bytes: leaf index (big-endian)
     # - N bytes: proof data
+    if len(record) < 4:
+        raise ValueError(f"Invalid proof record: too short ({len(record)} bytes)")
     
-    if len(proof_data) < 36:
-        raise ValueError(f"Invalid proof file: too short ({len(proof_data)} bytes)")
-    
-    leaf_hash = proof_data[:32]
-    leaf_index = int.from_bytes(proof_data[32:36], 'big')
-    proof_bytes = proof_data[36:]
+    leaf_index = int.from_bytes(record[:4], 'big')
+    proof_bytes = record[4:]
     
-    return leaf_hash, leaf_index, proof_bytes, len(proof_data)
+    return leaf_hash, leaf_index, proof_bytes, len(leaf_hash) + len(record)
 
 
 def verify_proof(symbol: str, leaf_hash: bytes, proof_bytes: bytes, expected_root: bytes) -> bool:
@@ -104,18 +198,15 @@ def verify_proof(symbol: str, leaf_hash: bytes, proof_bytes: bytes, expected_roo
         True if proof is valid
     """
     # First verify that the leaf hash matches the symbol
-    expected_leaf = hash_symbol(symbol)
+    expected_leaf = SYMBOL_LEAF_HASH.get(symbol) or hash_symbol(symbol)
     if leaf_hash != expected_leaf:
         print(f"[!] Leaf hash mismatch!")
         print(f"   Expected: 0x{expected_leaf.hex()[:16]}...")
         print(f"   Got:      0x{leaf_hash.hex()[:16]}...")
         return False
     
-    # Parse proof bytes
-    proof = MerkleTree.parse_proof_bytes(proof_bytes)
-    
-    # Verify the Merkle proof
-    return MerkleTree.verify_proof(leaf_hash, proof, expected_root)
+    # Verify the Merkle proof directly from its binary form
+    return MerkleTree.verify_proof_bytes(leaf_hash, proof_bytes, expected_root)
 
 
 def format_time(ms: float) -> str:
@@ -135,8 +226,8 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
-  python src/verifier.py --symbol LP+ --block 5000000 --local
-  python src/verifier.py --symbol Tf --block 5000000 --local
+  python verifier.py --symbol Dep --block 10002322 --local
+  python verifier.py --symbol Tf --block 10002322 --local
         """
     )
     
@@ -183,12 +274,12 @@ Examples:
         # Load BMR
         if args.verbose:
             print("[*] Loading BMR...")
-        bmr = load_bmr()
+        bmr = load_bmr(args.block)
         
         # Load proof
         if args.verbose:
             print(f"[*] Loading proof for '{args.symbol}'...")
-        leaf_hash, leaf_index, proof_bytes, proof_size = load_proof(args.symbol, args.block)
+        leaf_hash, leaf_index, proof_bytes, proof_size = load_proof(args.symbol, args.block, bmr)
         
         # Verify
         if args.verbose:
@@ -212,7 +303,7 @@ Examples:
             print(f"\n   Details:")
             print(f"   BMR: 0x{bmr.hex()}")
             print(f"   Leaf index: {leaf_index}")
-            print(f"   Proof path length: {len(MerkleTree.parse_proof_bytes(proof_bytes))} nodes")
+            print(f"   Proof path length: {proof_bytes[0] if proof_bytes else 0} nodes")
         
         print()
         